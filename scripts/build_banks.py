@@ -2,13 +2,20 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import functools
 import hashlib
 import json
+import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, Dict, List, Optional
 
-from extract_questions import parse_pdf  # type: ignore
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
 
 
 def make_bank_id(filename: str) -> str:
@@ -17,46 +24,127 @@ def make_bank_id(filename: str) -> str:
     return f"b{h}"
 
 
-def build_bank(pdf_path: Path, out_dir: Path) -> Dict:
+def file_sha1(path: Path) -> str:
+    with path.open("rb") as fp:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+: hashes in C without reading into Python
+            return hashlib.file_digest(fp, "sha1").hexdigest()
+        h = hashlib.sha1()
+        for chunk in iter(lambda: fp.read(1 << 20), b""):
+            h.update(chunk)
+        return h.hexdigest()
+
+
+def read_cached_meta(questions_path: Path) -> Optional[Dict]:
+    # Meta of a previously built questions.json, or None if missing/unreadable.
+    # Only the header is read: write_questions_json puts "meta" first, and JSON strings
+    # never contain a raw newline, so the meta object ends right before this marker.
+    marker = b',\n  "questions":'
+    head = b""
+    try:
+        with questions_path.open("rb") as fp:
+            while marker not in head:
+                chunk = fp.read(4096)
+                if not chunk:
+                    return None
+                head += chunk
+        data = head[: head.index(marker)] + b"}"
+        payload = orjson.loads(data) if orjson is not None else json.loads(data)
+    except (OSError, ValueError):
+        return None
+    meta = payload.get("meta") if isinstance(payload, dict) else None
+    return meta if isinstance(meta, dict) else None
+
+
+def dump_json(obj: Any) -> bytes:
+    # Pretty-printed UTF-8 JSON; orjson emits bytes directly and serializes dataclasses natively.
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, ensure_ascii=False, indent=2, default=asdict).encode("utf-8")
+
+
+def write_questions_json(path: Path, meta: Dict, questions: List) -> None:
+    """Stream {"meta": ..., "questions": [...]} to disk one question at a time.
+
+    The layout matches dump_json() of the whole payload, without materializing
+    every question's encoded form at once. Re-indenting by replacing newlines is
+    safe because JSON strings never contain a raw newline.
+
+    The file is written to a temp name and moved into place, so an interrupted run
+    never leaves a truncated file whose meta header read_cached_meta would trust.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        # Many small writes (one per question): give them a 1 MiB buffer.
+        with tmp_path.open("wb", buffering=1 << 20) as fp:
+            fp.write(b'{\n  "meta": ')
+            fp.write(dump_json(meta).replace(b"\n", b"\n  "))
+            fp.write(b',\n  "questions": [')
+            for i, q in enumerate(questions):
+                fp.write(b",\n    " if i else b"\n    ")
+                fp.write(dump_json(q).replace(b"\n", b"\n    "))
+            fp.write(b"\n  ]\n}" if questions else b"]\n}")
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def bank_record(bank_id: str, display_name: str, pdf_path: Path, count: int) -> Dict:
+    return {
+        "id": bank_id,
+        "name": display_name,
+        "sourceFile": pdf_path.name,
+        "sourcePdfPath": f"banks/{bank_id}/source.pdf",
+        "questionsPath": f"banks/{bank_id}/questions.json",
+        "count": count,
+    }
+
+
+def build_bank(pdf_path: Path, out_dir: Path, force: bool = False) -> Dict:
     display_name = pdf_path.stem
     bank_id = make_bank_id(pdf_path.name)
-    questions = parse_pdf(pdf_path)
 
     bank_dir = out_dir / bank_id
+    questions_path = bank_dir / "questions.json"
+    source_path = bank_dir / "source.pdf"
+    digest = file_sha1(pdf_path)
+
+    # Skip parsing when the existing output was built from identical PDF bytes.
+    # mtimes are not trusted here: git checkouts set them in checkout order.
+    if not force and source_path.exists():
+        cached = read_cached_meta(questions_path)
+        if cached and cached.get("contentHash") == digest and cached.get("bankName") == display_name:
+            return bank_record(bank_id, display_name, pdf_path, int(cached.get("count", 0)))
+
+    # Imported here so fully cached runs never load PyMuPDF.
+    from extract_questions import parse_pdf  # type: ignore
+
+    questions = parse_pdf(pdf_path)
     bank_dir.mkdir(parents=True, exist_ok=True)
 
-    payload = {
-        "meta": {
-            "bankId": bank_id,
-            "bankName": display_name,
-            "source": pdf_path.name,
-            "count": len(questions),
-        },
-        "questions": [q.__dict__ for q in questions],
+    meta = {
+        "bankId": bank_id,
+        "bankName": display_name,
+        "source": pdf_path.name,
+        "count": len(questions),
+        "contentHash": digest,
     }
 
-    (bank_dir / "questions.json").write_text(
-        json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
-
     # Copy original PDF into the deployed web assets so users can download it from GitHub Pages.
     # Use a stable ASCII filename to avoid URL encoding issues.
-    shutil.copyfile(pdf_path, bank_dir / "source.pdf")
+    shutil.copyfile(pdf_path, source_path)
 
-    return {
-        "id": bank_id,
-        "name": display_name,
-        "sourceFile": pdf_path.name,
-        "sourcePdfPath": f"banks/{bank_id}/source.pdf",
-        "questionsPath": f"banks/{bank_id}/questions.json",
-        "count": len(questions),
-    }
+    # Written last: its contentHash is what marks this bank as finished for the cache check.
+    write_questions_json(questions_path, meta, questions)
+
+    return bank_record(bank_id, display_name, pdf_path, len(questions))
 
 
 def main() -> None:
     ap = argparse.ArgumentParser(description="Build multiple banks for the web app")
     ap.add_argument("--bankDir", default="bank", help="Folder containing bank files (PDFs)")
     ap.add_argument("--outDir", default="web/banks", help="Output folder under web")
+    ap.add_argument("--force", action="store_true", help="Re-parse every PDF even if its cached output is up to date")
     args = ap.parse_args()
 
     bank_dir = Path(args.bankDir)
@@ -66,17 +154,18 @@ def main() -> None:
     pdfs = sorted([p for p in bank_dir.iterdir() if p.is_file() and p.suffix.lower() == ".pdf"] , key=lambda p: p.name)
     banks: List[Dict] = []
 
-    for pdf in pdfs:
-        banks.append(build_bank(pdf, out_dir))
+    # Each PDF is parsed independently, so fan the work out across processes.
+    # ex.map() yields results in input order, which keeps index.json stable.
+    if pdfs:
+        with ProcessPoolExecutor(max_workers=min(len(pdfs), os.cpu_count() or 1)) as ex:
+            banks = list(ex.map(functools.partial(build_bank, out_dir=out_dir, force=args.force), pdfs))
 
     index = {
         "meta": {"count": len(banks)},
         "banks": banks,
     }
 
-    (out_dir / "index.json").write_text(
-        json.dumps(index, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
+    (out_dir / "index.json").write_bytes(dump_json(index))
 
     print(f"Built {len(banks)} bank(s) into {out_dir}")
 
@@ -4,27 +4,58 @@
 import argparse
 import json
 import re
+import sys
 from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import fitz  # pymupdf
 
 
-QUESTION_START_RE = re.compile(r"^(?P<num>\d+)[\.．。]\s*【(?P<type>单选题|多选题|判断题|填空题)】(?P<rest>.*)$")
-# Plain numbering: 1. / 1． / 1、
-PLAIN_QUESTION_START_RE = re.compile(r"^(?P<num>\d+)[\.．。、]\s*(?P<rest>.*)$")
+_TYPE_MAP = {
+    "单选题": "single",
+    "多选题": "multiple",
+    "判断题": "judge",
+    "填空题": "blank",
+}
+
 # Options: A. / A． / A、 / A: / A：
-OPTION_RE = re.compile(r"^(?P<label>[A-H])[\.．。、:：]\s*(?P<text>.*)$")
-ANSWER_RE = re.compile(r"^答案[:：]\s*(?P<ans>.*)$")
-ANSWER_EXPL_RE = re.compile(r"^答案解释[:：]\s*(?P<expl>.*)$")
-DIFF_RE = re.compile(r"^难易度[:：](?P<diff>.*)$")
+_OPT_LABELS = frozenset("ABCDEFGH")
+_OPT_DELIMS = frozenset(".．。、:：")
 PAREN_ANSWER_INLINE_RE = re.compile(r"[（(]\s*([A-H]{1,8})\s*[)）]")
-PAREN_ANSWER_STANDALONE_RE = re.compile(r"^[（(]\s*([A-H]{1,8})\s*[)）]\s*$")
 INLINE_OPTION_MARK_RE = re.compile(r"(?P<label>[A-H])[\.．。、]\s*")
 
-
-@dataclass
+# All line-anchored formats fused into one alternation so each line is matched once;
+# the outer group name (m.lastgroup) tells parse_pdf which kind of line it is.
+# Order matters only for qstart vs plainq (the bracket style is a subset of plain numbering).
+_LINE_RE = re.compile(
+    r"^(?:"
+    # 1. 【单选题】...
+    r"(?P<qstart>(?P<qnum>\d+)[\.．。]\s*【(?P<qtype>单选题|多选题|判断题|填空题)】(?P<qrest>.*))"
+    # Plain numbering: 1. / 1． / 1、
+    r"|(?P<plainq>(?P<pnum>\d+)[\.．。、]\s*(?P<prest>.*))"
+    # Standalone answer line: ( C )
+    r"|(?P<stand>[（(]\s*(?P<sans>[A-H]{1,8})\s*[)）]\s*)"
+    r"|(?P<ans>答案[:：]\s*(?P<atext>.*))"
+    r"|(?P<expl>答案解释[:：]\s*(?P<etext>.*))"
+    r"|(?P<diff>难易度[:：](?P<dtext>.*))"
+    r"|(?P<opt>(?P<olabel>[A-H])[\.．。、:：]\s*(?P<otext>.*))"
+    r")$"
+)
+
+# Helpers used per line / per answer; compiled once so hot loops skip the re-module cache lookup.
+_WS_RE = re.compile(r"\s+")
+# Letter answers may be lowercase in the PDF; match both cases and upper-case only the result.
+_LETTER_RE = re.compile(r"[A-Ha-h]")
+_LETTER_FULL_RE = re.compile(r"[A-Ha-h]{1,8}")
+_ANS_SPLIT_RE = re.compile(r"[，,;；、/\\|]\s*")
+_NON_COMPACT_RE = re.compile(r"[^0-9a-z\u4e00-\u9fff]+")
+
+# Invisible chars that break regex anchors are dropped; ideographic spaces become plain spaces.
+_INVISIBLE_TRANS = str.maketrans({"\ufeff": None, "\u200b": None, "\u3000": " "})
+
+
+@dataclass(slots=True)
 class Question:
     id: str
     type: str  # single|multiple|judge|blank
@@ -38,12 +69,20 @@ class Question:
 
 def normalize_line(line: str) -> str:
     # Remove common invisible chars that break regex anchors
-    line = line.replace("\ufeff", "").replace("\u200b", "")
-    line = line.replace("\u3000", " ")
-    line = re.sub(r"\s+", " ", line).strip()
+    line = line.translate(_INVISIBLE_TRANS)
+    # Fast path: isprintable() rules out every whitespace char except the ASCII space,
+    # so without double spaces there is nothing for the regex to collapse.
+    if "  " not in line and line.isprintable():
+        return line.strip()
+    line = _WS_RE.sub(" ", line).strip()
     return line
 
 
+def _quick_option(line: str) -> bool:
+    # Same test as the "opt" branch of _LINE_RE, done with two character lookups.
+    return len(line) >= 2 and line[0] in _OPT_LABELS and line[1] in _OPT_DELIMS
+
+
 def extract_inline_options(line: str) -> Tuple[str, Optional[Dict[str, str]]]:
     """Extract options embedded in a single line.
 
@@ -57,7 +96,7 @@ def extract_inline_options(line: str) -> Tuple[str, Optional[Dict[str, str]]]:
 
     # Heuristic: treat as inline options if there are at least 2 markers,
     # or if the line starts with an option marker.
-    starts_with_marker = bool(OPTION_RE.match(line))
+    starts_with_marker = _quick_option(line)
     if len(matches) < 2 and not starts_with_marker:
         return line, None
 
@@ -76,33 +115,21 @@ def extract_inline_options(line: str) -> Tuple[str, Optional[Dict[str, str]]]:
     return line, None
 
 
-def question_type_map(t: str) -> str:
-    return {
-        "单选题": "single",
-        "多选题": "multiple",
-        "判断题": "judge",
-        "填空题": "blank",
-    }[t]
-
-
-def is_noise_line(line: str) -> bool:
-    if not line:
-        return True
-    # Page numbers like "56", "57" etc.
-    if line.isdigit() and len(line) <= 3:
-        return True
-    # Table of contents leftovers etc.
-    return False
-
-
 def join_parts(parts: List[str]) -> str:
     text = " ".join(p for p in parts if p)
-    text = re.sub(r"\s+", " ", text).strip()
+    text = _WS_RE.sub(" ", text).strip()
     return text
 
 
+def _search_paren_answer(text: str) -> Optional["re.Match[str]"]:
+    # Most lines contain no parenthesis at all; a substring test is far cheaper than a regex search.
+    if "(" not in text and "（" not in text:
+        return None
+    return PAREN_ANSWER_INLINE_RE.search(text)
+
+
 def _is_letter_answer(ans: str) -> bool:
-    return bool(re.fullmatch(r"[A-H]{1,8}", ans.strip().upper()))
+    return bool(_LETTER_FULL_RE.fullmatch(ans.strip()))
 
 
 def _infer_judge_from_options(options: Dict[str, str]) -> bool:
@@ -133,9 +160,9 @@ def _map_answer_to_letters(answer_raw: str, options: Dict[str, str]) -> str:
         return ans
 
     # If letters are explicitly present, prefer that.
-    letters = re.findall(r"[A-H]", ans.upper())
+    letters = _LETTER_RE.findall(ans)
     if letters:
-        uniq = "".join(sorted(set(letters)))
+        uniq = "".join(sorted({c.upper() for c in letters}))
         if _is_letter_answer(uniq):
             return uniq
 
@@ -145,16 +172,25 @@ def _map_answer_to_letters(answer_raw: str, options: Dict[str, str]) -> str:
     def compact(s: str) -> str:
         # Keep digits/letters/CJK; drop punctuation/whitespace for robust contains matching.
         s = normalize_line(s).lower()
-        return re.sub(r"[^0-9a-z\u4e00-\u9fff]+", "", s)
+        return _NON_COMPACT_RE.sub("", s)
 
     # Normalize option texts
     opt_norm = {k: normalize_line(v) for k, v in options.items()}
     opt_norm_lower = {k: opt_norm[k].lower() for k in opt_norm}
     opt_compact = {k: compact(opt_norm[k]) for k in opt_norm}
 
+    # Reverse lookups for exact matches (first label wins on duplicate texts) and the
+    # options long enough to take part in contains matching; built once per question.
+    exact_lower: Dict[str, str] = {}
+    exact_compact: Dict[str, str] = {}
+    for k in opt_norm:
+        exact_lower.setdefault(opt_norm_lower[k], k)
+        exact_compact.setdefault(opt_compact[k], k)
+    long_compact = [(k, textc) for k, textc in opt_compact.items() if len(textc) >= 4]
+
     # Split answer by common separators to match multiple items
     # Include Chinese list separator "、" and slashes.
-    parts = [p.strip() for p in re.split(r"[，,;；、/\\|]\s*", ans) if p.strip()]
+    parts = [p.strip() for p in _ANS_SPLIT_RE.split(ans) if p.strip()]
     candidates = parts if len(parts) > 1 else [ans]
 
     matched_set: set[str] = set()
@@ -165,31 +201,23 @@ def _map_answer_to_letters(answer_raw: str, options: Dict[str, str]) -> str:
         token_c = compact(token_n)
 
         # Prefer exact matches
-        for label, text in opt_norm_lower.items():
-            if token_l and token_l == text:
-                return [label]
+        if token_l and token_l in exact_lower:
+            return [exact_lower[token_l]]
 
-        for label, textc in opt_compact.items():
-            if token_c and token_c == textc and token_c:
-                return [label]
+        if token_c and token_c in exact_compact:
+            return [exact_compact[token_c]]
 
         # If token is short (like a number), only allow exact compact match (avoid false positives)
         if len(token_c) <= 3:
             return []
 
-        out: List[str] = []
         # Contains match: option text appears within answer token
-        for label, textc in opt_compact.items():
-            if len(textc) >= 4 and textc in token_c:
-                out.append(label)
+        out = [label for label, textc in long_compact if textc in token_c]
         if out:
             return out
 
         # Reverse contains: answer token is contained within option text
-        for label, textc in opt_compact.items():
-            if len(token_c) >= 4 and token_c in textc:
-                out.append(label)
-        return out
+        return [label for label, textc in opt_compact.items() if token_c in textc]
 
     for part in candidates:
         for label in match_one(part):
@@ -198,8 +226,8 @@ def _map_answer_to_letters(answer_raw: str, options: Dict[str, str]) -> str:
     # If not split, also try scanning whole answer for any option texts (helps when answers are concatenated)
     if not matched_set and len(candidates) == 1:
         ans_c = compact(ans)
-        for label, textc in opt_compact.items():
-            if len(textc) >= 4 and textc in ans_c:
+        for label, textc in long_compact:
+            if textc in ans_c:
                 matched_set.add(label)
 
     if matched_set:
@@ -209,6 +237,26 @@ def _map_answer_to_letters(answer_raw: str, options: Dict[str, str]) -> str:
     return ans
 
 
+def _iter_lines(doc: fitz.Document) -> Iterator[Tuple[int, str]]:
+    """Yield (page_index, raw_line) for every text line, page by page.
+
+    Lines come from each page's text blocks, which PyMuPDF already returns in reading order.
+    Extraction stays on the calling thread: a MuPDF document must not be shared across
+    threads and PyMuPDF keeps the GIL while extracting, so a page-prefetch thread would
+    only add overhead. build_banks parallelizes across PDFs with processes instead.
+    """
+    for page_index in range(doc.page_count):
+        page = doc.load_page(page_index)
+        # Build the TextPage once and read pre-segmented blocks from it instead of
+        # letting get_text("text") rebuild it and flatten everything into one string.
+        # Use get_text("text")'s flags: the default (0) turns unmapped glyphs into U+FFFD.
+        tp = page.get_textpage(flags=fitz.TEXTFLAGS_TEXT)
+        for block in tp.extractBLOCKS():
+            for raw in str(block[4] or "").split("\n"):
+                yield page_index, raw
+        tp = None  # release the TextPage before moving on to the next page
+
+
 def parse_pdf(pdf_path: Path) -> List[Question]:
     doc = fitz.open(str(pdf_path))
 
@@ -216,29 +264,41 @@ def parse_pdf(pdf_path: Path) -> List[Question]:
     current: Optional[Question] = None
     stem_parts: List[str] = []
 
-    current_option_label: Optional[str] = None
-    option_parts: Dict[str, List[str]] = {}
+    # Option text buffers live in fixed slots A..H (index = ord(label) - 65); bit i of
+    # option_mask is set once slot i is opened, current_option_idx is the last opened slot.
+    current_option_idx: Optional[int] = None
+    option_parts: List[Optional[List[str]]] = [None] * 8
+    option_mask = 0
 
     explanation_parts: List[str] = []
 
     skipped_unanswered = 0
+    # (type, stem, answer) of kept questions; repeats are PDF artifacts and are dropped.
+    seen: set[Tuple[str, str, str]] = set()
 
     def finalize_current():
         nonlocal skipped_unanswered
-        nonlocal current, stem_parts, current_option_label, option_parts, explanation_parts
+        nonlocal current, stem_parts, current_option_idx, option_parts, option_mask, explanation_parts
         if not current:
             return
 
         current.stem = join_parts(stem_parts)
 
-        if option_parts:
-            current.options = {k: join_parts(v) for k, v in option_parts.items()}
+        if option_mask:
+            current.options = {}
+            mask = option_mask
+            while mask:
+                low = mask & -mask  # lowest opened slot first, so labels come out A..H
+                idx = low.bit_length() - 1
+                current.options[chr(65 + idx)] = join_parts(option_parts[idx])
+                mask ^= low
 
         # Normalize answers for choice/judge questions where the PDF provides answer text.
         if current.answer and current.options and current.type in {"single", "multiple", "judge"}:
             mapped = _map_answer_to_letters(current.answer, current.options)
             if mapped and _is_letter_answer(mapped):
-                current.answer = mapped
+                # Letter answers ("A", "ABD", ...) repeat across the whole bank; share one object each.
+                current.answer = sys.intern(mapped)
                 current.type = "multiple" if len(mapped) > 1 else "single"
                 if _infer_judge_from_options(current.options):
                     current.type = "judge"
@@ -247,179 +307,173 @@ def parse_pdf(pdf_path: Path) -> List[Question]:
             current.explanation = join_parts(explanation_parts)
 
         if current.stem and current.answer:
-            questions.append(current)
+            key = (current.type, current.stem, current.answer)
+            if key not in seen:
+                seen.add(key)
+                questions.append(current)
         else:
             skipped_unanswered += 1
 
         current = None
         stem_parts = []
-        current_option_label = None
-        option_parts = {}
+        current_option_idx = None
+        option_parts = [None] * 8
+        option_mask = 0
         explanation_parts = []
 
-    for page_index in range(doc.page_count):
-        page = doc.load_page(page_index)
-        text = str(page.get_text("text") or "")
-        raw_lines = text.splitlines()
-
-        for raw in raw_lines:
-            line = normalize_line(raw)
-            if is_noise_line(line):
-                continue
-
-            m_start = QUESTION_START_RE.match(line)
-            if m_start:
-                # New question starts; finalize previous
-                finalize_current()
-
-                qnum = m_start.group("num")
-                qtype_cn = m_start.group("type")
-                rest = normalize_line(m_start.group("rest"))
-
-                current = Question(
-                    id=f"p{page_index + 1}-{qnum}",
-                    type=question_type_map(qtype_cn),
-                    stem="",
-                    options=None,
-                    answer=None,
-                    explanation=None,
-                    difficulty=None,
-                    source={"page": page_index + 1, "number": int(qnum)},
-                )
+    def open_option(label: str) -> List[str]:
+        # Make `label` the current option and return its (possibly new) text buffer.
+        nonlocal current_option_idx, option_mask
+        idx = ord(label) - 65
+        parts = option_parts[idx]
+        if parts is None:
+            parts = option_parts[idx] = []
+            option_mask |= 1 << idx
+        current_option_idx = idx
+        return parts
+
+    for page_index, raw in _iter_lines(doc):
+        line = normalize_line(raw)
+        # Skip blank lines and page numbers like "56", "57" (length gate before isdigit).
+        if not line or (len(line) <= 3 and line.isdigit()):
+            continue
+
+        m_line = _LINE_RE.match(line)
+        kind = m_line.lastgroup if m_line else None
+
+        if kind == "qstart":
+            # New question starts; finalize previous
+            finalize_current()
+
+            qnum = m_line.group("qnum")
+            qtype_cn = m_line.group("qtype")
+            # Captures come from an already-normalized line; join_parts collapses the rest.
+            rest = m_line.group("qrest")
+
+            current = Question(
+                id=f"p{page_index + 1}-{qnum}",
+                type=_TYPE_MAP[qtype_cn],
+                stem="",
+                options=None,
+                answer=None,
+                explanation=None,
+                difficulty=None,
+                source={"page": page_index + 1, "number": int(qnum)},
+            )
+            if rest:
+                stem_parts.append(rest)
+            continue
+
+        # Plain format: "12. ..." with options below and answer like "( C )" either inline or standalone line.
+        # If it's actually the bracket style, it would have matched as qstart.
+        if kind == "plainq":
+            finalize_current()
+            qnum = m_line.group("pnum")
+            rest = m_line.group("prest")
+
+            current = Question(
+                id=f"p{page_index + 1}-{qnum}",
+                type="single",  # will adjust to multiple if needed
+                stem="",
+                options=None,
+                answer=None,
+                explanation=None,
+                difficulty=None,
+                source={"page": page_index + 1, "number": int(qnum)},
+            )
+
+            # Extract inline answer if present in the rest
+            if rest:
+                m_inline = _search_paren_answer(rest)
+                if m_inline:
+                    ans = m_inline.group(1)
+                    current.answer = ans
+                    # Remove the answer token from the stem text
+                    rest = PAREN_ANSWER_INLINE_RE.sub("", rest).strip()
+                    current.type = "multiple" if len(ans) > 1 else "single"
                 if rest:
                     stem_parts.append(rest)
-                continue
-
-            # Plain format: "12. ..." with options below and answer like "( C )" either inline or standalone line.
-            m_plain = PLAIN_QUESTION_START_RE.match(line)
-            if m_plain and not line.startswith("答案"):
-                # Avoid treating option lines or other dotted items as question starts
-                if OPTION_RE.match(line):
-                    pass
-                else:
-                    # If it's actually the bracket style, it would have matched earlier.
-                    finalize_current()
-                    qnum = m_plain.group("num")
-                    rest = normalize_line(m_plain.group("rest"))
-
-                    current = Question(
-                        id=f"p{page_index + 1}-{qnum}",
-                        type="single",  # will adjust to multiple if needed
-                        stem="",
-                        options=None,
-                        answer=None,
-                        explanation=None,
-                        difficulty=None,
-                        source={"page": page_index + 1, "number": int(qnum)},
-                    )
-
-                    # Extract inline answer if present in the rest
-                    if rest:
-                        m_inline = PAREN_ANSWER_INLINE_RE.search(rest)
-                        if m_inline:
-                            ans = normalize_line(m_inline.group(1)).upper()
-                            current.answer = ans
-                            # Remove the answer token from the stem text
-                            rest = normalize_line(PAREN_ANSWER_INLINE_RE.sub("", rest))
-                            current.type = "multiple" if len(ans) > 1 else "single"
-                        if rest:
-                            stem_parts.append(rest)
-                    continue
+            continue
 
-            if not current:
-                continue
+        if not current:
+            continue
 
-            # Plain format answer can be on a standalone line like "( C )"
-            m_standalone = PAREN_ANSWER_STANDALONE_RE.match(line)
-            if m_standalone and not current.answer:
-                ans = normalize_line(m_standalone.group(1)).upper()
+        # Plain format answer can be on a standalone line like "( C )"
+        if kind == "stand" and not current.answer:
+            ans = m_line.group("sans")
+            current.answer = ans
+            current.type = "multiple" if len(ans) > 1 else "single"
+            current_option_idx = None
+            continue
+
+        # Plain format answer can also be inline on a continuation line like "...。( C )"
+        if not current.answer:
+            m_inline_any = _search_paren_answer(line)
+            if m_inline_any:
+                ans = m_inline_any.group(1)
                 current.answer = ans
                 current.type = "multiple" if len(ans) > 1 else "single"
-                current_option_label = None
-                continue
-
-            # Plain format answer can also be inline on a continuation line like "...。( C )"
-            if not current.answer:
-                m_inline_any = PAREN_ANSWER_INLINE_RE.search(line)
-                if m_inline_any:
-                    ans = normalize_line(m_inline_any.group(1)).upper()
-                    current.answer = ans
-                    current.type = "multiple" if len(ans) > 1 else "single"
-                    line = normalize_line(PAREN_ANSWER_INLINE_RE.sub("", line))
-                    if not line:
-                        continue
-
-            m_ans = ANSWER_RE.match(line)
-            if m_ans:
-                current.answer = normalize_line(m_ans.group("ans"))
-                current_option_label = None
-                continue
-
-            m_expl = ANSWER_EXPL_RE.match(line)
-            if m_expl:
-                explanation_parts.append(normalize_line(m_expl.group("expl")))
-                current_option_label = None
-                continue
-
-            m_diff = DIFF_RE.match(line)
-            if m_diff:
-                current.difficulty = normalize_line(m_diff.group("diff"))
-                current_option_label = None
-                continue
-
-            # If we are already in explanation, keep collecting until difficulty/new question
-            if explanation_parts and not OPTION_RE.match(line) and not ANSWER_RE.match(line):
-                explanation_parts.append(line)
-                continue
-
-            # Inline options embedded in the same line as stem
-            prefix, inline_opts = extract_inline_options(line)
-            if inline_opts:
-                if prefix:
-                    if current_option_label and current_option_label in option_parts:
-                        option_parts[current_option_label].append(prefix)
-                    else:
-                        stem_parts.append(prefix)
-
-                for label, text_part in inline_opts.items():
-                    current_option_label = label
-                    option_parts.setdefault(label, [])
-                    if text_part:
-                        option_parts[label].append(text_part)
-                continue
-
-            m_opt = OPTION_RE.match(line)
-            if m_opt:
-                label = m_opt.group("label")
-                text_part = normalize_line(m_opt.group("text"))
-                current_option_label = label
-                option_parts.setdefault(label, [])
-                if text_part:
-                    option_parts[label].append(text_part)
-                continue
+                line = normalize_line(PAREN_ANSWER_INLINE_RE.sub("", line))
+                if not line:
+                    continue
+                # The line changed, so classify it again.
+                m_line = _LINE_RE.match(line)
+                kind = m_line.lastgroup if m_line else None
 
-            # Continuation line: belongs to option if last option exists, else stem
-            if current_option_label and current_option_label in option_parts:
-                option_parts[current_option_label].append(line)
-            else:
-                stem_parts.append(line)
+        if kind == "ans":
+            current.answer = normalize_line(m_line.group("atext"))
+            current_option_idx = None
+            continue
 
-    finalize_current()
+        if kind == "expl":
+            explanation_parts.append(m_line.group("etext"))
+            current_option_idx = None
+            continue
 
-    # De-duplicate by (type, stem, answer) if repeated due to PDF artifacts
-    seen: set[Tuple[str, str, str]] = set()
-    uniq: List[Question] = []
-    for q in questions:
-        key = (q.type, q.stem, q.answer or "")
-        if key in seen:
+        if kind == "diff":
+            current.difficulty = normalize_line(m_line.group("dtext"))
+            current_option_idx = None
             continue
-        seen.add(key)
-        uniq.append(q)
+
+        # If we are already in explanation, keep collecting until difficulty/new question
+        if explanation_parts and kind != "opt":
+            explanation_parts.append(line)
+            continue
+
+        # Inline options embedded in the same line as stem
+        prefix, inline_opts = extract_inline_options(line)
+        if inline_opts:
+            if prefix:
+                if current_option_idx is not None:
+                    option_parts[current_option_idx].append(prefix)
+                else:
+                    stem_parts.append(prefix)
+
+            for label, text_part in inline_opts.items():
+                parts = open_option(label)
+                if text_part:
+                    parts.append(text_part)
+            continue
+
+        if kind == "opt":
+            parts = open_option(m_line.group("olabel"))
+            text_part = m_line.group("otext")
+            if text_part:
+                parts.append(text_part)
+            continue
+
+        # Continuation line: belongs to option if last option exists, else stem
+        if current_option_idx is not None:
+            option_parts[current_option_idx].append(line)
+        else:
+            stem_parts.append(line)
+
+    finalize_current()
 
     if skipped_unanswered:
         print(f"[extract_questions] Skipped {skipped_unanswered} entries without both stem+answer")
 
-    return uniq
+    return questions
 
 
 def main():